@@ -4,6 +4,7 @@ import arcpy
 from arcpy import env
 import os
 import datetime
+import numpy as np
 import pandas as pd
 
 # Set environment settings
@@ -13,16 +14,59 @@ env.workspace = os.path.join(arcpy.mp.ArcGISProject('current').homeFolder, "outp
 env.overwriteOutput = True
 
 # Helper function to get feature table as pd
+# All attribute fields are read in one columnar block via TableToNumPyArray. NULLs are filled with a
+# per-type placeholder; rows holding the placeholder are checked against an "IS NULL" query, so only
+# true NULLs become NaN/None/NaT. Numeric columns are returned as 64 bit like with a cursor read.
+# Geometry (and any other type numpy cannot hold) is still read via SearchCursor
 # Credits go to https://gist.github.com/d-wasserman/e9c98be1d0caebc2935afecf0ba239a0   
 def arcgis_table_to_df(in_fc, input_fields=None, query=""):
     OIDFieldName = arcpy.Describe(in_fc).OIDFieldName
+    field_types = {field.name: field.type for field in arcpy.ListFields(in_fc)}
     if input_fields:
         final_fields = [OIDFieldName] + input_fields
     else:
-        final_fields = [field.name for field in arcpy.ListFields(in_fc)]
-    data = [row for row in arcpy.da.SearchCursor(in_fc,final_fields,where_clause=query)]
-    fc_dataframe = pd.DataFrame(data,columns=final_fields)
-    fc_dataframe = fc_dataframe.set_index(OIDFieldName,drop=True)
+        final_fields = list(field_types)
+    null_fills = {'Double': np.nan, 'Single': np.nan,
+                  'Integer': np.iinfo(np.int32).min, 'SmallInteger': np.iinfo(np.int16).min,
+                  'BigInteger': np.iinfo(np.int64).min, 'String': '', 'GUID': '', 'GlobalID': '',
+                  'Date': datetime.datetime(1900, 1, 1)}
+    array_fields = [name for name in final_fields if name != OIDFieldName and field_types.get(name) in null_fills]
+    cursor_fields = [name for name in final_fields if name != OIDFieldName and name not in array_fields]
+    data = arcpy.da.TableToNumPyArray(in_fc, [OIDFieldName] + array_fields, where_clause=query,
+                                      null_value={name: null_fills[field_types[name]] for name in array_fields})
+    fc_dataframe = pd.DataFrame(data).set_index(OIDFieldName, drop=True)
+    for name in array_fields:
+        field_type = field_types[name]
+        if field_type in ('Double', 'Single'):
+            fc_dataframe[name] = fc_dataframe[name].astype('float64')
+            continue
+        if field_type == 'Date':
+            fc_dataframe[name] = pd.to_datetime(fc_dataframe[name])
+            has_fill = fc_dataframe[name] == pd.Timestamp(null_fills[field_type])
+        else:
+            has_fill = fc_dataframe[name] == null_fills[field_type]
+        if field_type in ('Integer', 'SmallInteger', 'BigInteger'):
+            fc_dataframe[name] = fc_dataframe[name].astype('int64')
+        elif field_type != 'Date':
+            fc_dataframe[name] = fc_dataframe[name].astype(object)
+        if has_fill.any():
+            null_clause = "{} IS NULL".format(arcpy.AddFieldDelimiters(in_fc, name))
+            if query:
+                null_clause = "({}) AND {}".format(query, null_clause)
+            null_oids = arcpy.da.TableToNumPyArray(in_fc, [OIDFieldName], where_clause=null_clause)[OIDFieldName]
+            is_null = fc_dataframe.index.isin(null_oids)
+            if field_type in ('Integer', 'SmallInteger', 'BigInteger'):
+                fc_dataframe[name] = fc_dataframe[name].astype('float64')
+                fc_dataframe.loc[is_null, name] = np.nan
+            elif field_type == 'Date':
+                fc_dataframe.loc[is_null, name] = pd.NaT
+            else:
+                fc_dataframe.loc[is_null, name] = None
+    if cursor_fields:
+        data = [row for row in arcpy.da.SearchCursor(in_fc, [OIDFieldName] + cursor_fields, where_clause=query)]
+        cursor_dataframe = pd.DataFrame(data, columns=[OIDFieldName] + cursor_fields).set_index(OIDFieldName, drop=True)
+        fc_dataframe = fc_dataframe.join(cursor_dataframe)
+    fc_dataframe = fc_dataframe.loc[:, [name for name in final_fields if name != OIDFieldName]]
     return fc_dataframe
 
 ### Part I - Food Collection ###
@@ -155,10 +199,71 @@ res_routes = pd.concat(res_routes)
 
 res_routes.to_csv(os.path.join(arcpy.mp.ArcGISProject('current').homeFolder, 'stats_routes.csv'))
 
-# Note: Service Area Calculation done via GUI
-# Get service area stats
-service_area_stats = arcgis_table_to_df("Polygons_TabulateIntersectio").sort_values(['PERCENTAGE'], ascending=False)
-service_area_stats['sum_18_65_aa'] = service_area_stats['a_18_65_aa'].cumsum()
-service_area_stats = service_area_stats.loc[:, ['Name', 'a_18_65_aa', 'sum_18_65_aa']]
+
+
+### Part III - Service Areas ###
+# Set local variables for service areas
+# Isochrones are solved on a local network dataset for all depot candidates & travel time breaks at once
+# Required inputs in the default gdb (not created by this script):
+#   - street_network/street_network_ND: network dataset providing the travel mode below
+#   - depot_candidates: point feature class of candidate depots, "Name" field is used as facility name
+local_network = os.path.join(input_gdb, "street_network", "street_network_ND")
+in_depot_candidates = os.path.join(input_gdb, "depot_candidates")
+sa_travel_mode = "Driving Time"
+travel_time_breaks = [5, 10, 15, 20]
+out_polygons = "service_areas_candidates"
+out_facilities = "service_areas_facilities"
+
+nd_layer_name = "street_network_nd"
+arcpy.nax.MakeNetworkDatasetLayer(local_network, nd_layer_name)
+nd_travel_modes = arcpy.nax.GetTravelModes(nd_layer_name)
+if sa_travel_mode not in nd_travel_modes:
+    raise ValueError("Travel mode '{}' not defined on {}, available modes: {}".format(
+                     sa_travel_mode, local_network, ", ".join(nd_travel_modes)))
+
+service_area = arcpy.nax.ServiceArea(nd_layer_name)
+service_area.travelMode = nd_travel_modes[sa_travel_mode]
+service_area.timeUnits = arcpy.nax.TimeUnits.Minutes
+service_area.defaultImpedanceCutoffs = travel_time_breaks
+service_area.travelDirection = arcpy.nax.TravelDirection.FromFacility
+service_area.outputType = arcpy.nax.ServiceAreaOutputType.Polygons
+service_area.geometryAtCutoff = arcpy.nax.ServiceAreaPolygonCutoffGeometry.Rings
+service_area.geometryAtOverlap = arcpy.nax.ServiceAreaOverlapGeometry.Overlap
+service_area.load(arcpy.nax.ServiceAreaInputDataType.Facilities, in_depot_candidates)
+
+# Solve the service areas & export the isochrone rings
+service_area_result = service_area.solve()
+if not service_area_result.solveSucceeded:
+    raise RuntimeError("Service area solve failed:\n{}".format(
+                       service_area_result.solverMessages(arcpy.nax.MessageSeverity.All)))
+service_area_result.export(arcpy.nax.ServiceAreaOutputDataType.Polygons, out_polygons)
+service_area_result.export(arcpy.nax.ServiceAreaOutputDataType.Facilities, out_facilities)
+
+# Intersect all rings with the population layer in a single (spatially indexed) geoprocessing call
+arcpy.analysis.TabulateIntersection(in_zone_features=out_polygons,
+                                    zone_fields=["FacilityID", "ToBreak"],
+                                    in_class_features="inhabitants_18_65",
+                                    out_table="service_areas_population",
+                                    sum_fields="a_18_65_aa")
+
+# Get service area stats - population per ring & cumulated over breaks for each depot candidate
+# Rings without any intersecting population get no row from TabulateIntersection -> fill full grid with 0
+# Rings refer to the ObjectID of the exported facilities via FacilityID -> use the OID index as key
+facilities = arcgis_table_to_df(out_facilities, ["Name"])
+ring_population = arcgis_table_to_df("service_areas_population", ["FacilityID", "ToBreak", "a_18_65_aa"])
+ring_population['ToBreak'] = ring_population['ToBreak'].astype(float)
+full_grid = pd.MultiIndex.from_product([facilities.index, [float(brk) for brk in sorted(travel_time_breaks)]],
+                                       names=['FacilityID', 'ToBreak'])
+service_area_stats = (ring_population.groupby(['FacilityID', 'ToBreak'])['a_18_65_aa'].sum()
+                                     .reindex(full_grid, fill_value=0)
+                                     .reset_index()
+                                     .sort_values(['FacilityID', 'ToBreak']))
+service_area_stats['sum_18_65_aa'] = service_area_stats.groupby('FacilityID')['a_18_65_aa'].cumsum()
+service_area_stats.insert(1, 'Name', service_area_stats['FacilityID'].map(facilities['Name']))
 service_area_stats.to_csv(os.path.join(arcpy.mp.ArcGISProject('current').homeFolder, 'stats_serviceareas.csv'))
-          
+
+# Compare depot candidates - covered population per travel time break, best candidates first
+candidate_coverage = (service_area_stats.pivot_table(index=['FacilityID', 'Name'], columns='ToBreak',
+                                                     values='sum_18_65_aa', aggfunc='sum')
+                                        .sort_values(float(max(travel_time_breaks)), ascending=False))
+candidate_coverage.to_csv(os.path.join(arcpy.mp.ArcGISProject('current').homeFolder, 'stats_depot_candidates.csv'))